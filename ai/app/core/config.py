@@ -1,5 +1,7 @@
 """アプリ設定の読み込みと共有ユーティリティ。"""
 
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 from pydantic import Field, SecretStr
 
@@ -27,6 +29,8 @@ class Settings(BaseSettings):
     # RAG/Tavily 設定
     tavily_api_key: SecretStr | None = Field(default=None, validation_alias="TAVILY_API_KEY")
     tavily_max_per_run: int = Field(default=3, validation_alias="TAVILY_MAX_PER_RUN")
+    # RAG方式: react（ReActエージェントで逐次検索）/ plan_parallel（検索計画→並列検索→一括生成）
+    rag_mode: Literal["react", "plan_parallel"] = Field(default="react", validation_alias="RAG_MODE")
     
     @property
     def rag_enable(self) -> bool:
@@ -41,6 +45,19 @@ class Settings(BaseSettings):
 
     llm_timeout_sec: int = Field(default=60, validation_alias="LLM_TIMEOUT_SEC")
 
+    # 旅程編集の出力方式: full（旅程全体を再生成）/ patch（変更操作の一覧を生成して適用）
+    edit_mode: Literal["full", "patch"] = Field(default="full", validation_alias="EDIT_MODE")
+
+    # リクエスト期限（X-Request-Deadline）関連
+    # ヘッダ未指定時の予算、かつヘッダ指定時の上限
+    request_budget_sec: float = Field(default=30, validation_alias="REQUEST_BUDGET_SEC")
+    # レスポンス返却のために残しておく余裕
+    deadline_safety_margin_sec: float = Field(default=1.0, validation_alias="DEADLINE_SAFETY_MARGIN_SEC")
+    tavily_timeout_sec: float = Field(default=10, validation_alias="TAVILY_TIMEOUT_SEC")
+    # ReActエージェント1ステップあたりの見積もり時間とステップ上限
+    agent_step_sec: float = Field(default=3, gt=0, validation_alias="AGENT_STEP_SEC")
+    agent_max_recursion: int = Field(default=12, ge=3, validation_alias="AGENT_MAX_RECURSION")
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -0,0 +1,191 @@
+"""リクエスト期限（デッドライン）の伝播とキャンセル制御。
+
+バックエンド（InternalPythonClient）が付与する ``X-Request-Deadline`` ヘッダから
+残り時間を求め、LLM呼び出し・Tavily検索・ReActエージェントの予算を導出する。
+期限切れまたはクライアント切断時は実行中の処理をキャンセルし、件数を記録する。
+"""
+
+import asyncio
+import logging
+import math
+import time
+from typing import Awaitable, Dict, Optional, TypeVar
+
+from fastapi import Request
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEADLINE_HEADER = "X-Request-Deadline"
+
+# クライアント切断の確認間隔（秒）
+_DISCONNECT_POLL_SEC = 0.5
+
+# キャンセル件数（プロセス内カウンタ、/health で公開）
+_cancellation_counts: Dict[str, int] = {
+    "deadline_exceeded": 0,
+    "client_disconnected": 0,
+}
+
+
+class RequestCancelled(Exception):
+    """期限切れまたはクライアント切断により処理を打ち切ったことを表す例外。
+
+    Attributes:
+        reason: ``deadline_exceeded`` または ``client_disconnected``
+    """
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Deadline:
+    """1リクエスト分の時間予算。
+
+    単調時計で期限を保持し、残り時間から各呼び出しのタイムアウトや
+    エージェントのステップ上限を導出する。
+    """
+
+    def __init__(self, budget_sec: float) -> None:
+        """
+        Args:
+            budget_sec: 現時点からの残り時間（秒）
+        """
+        self._expires_at = time.monotonic() + max(0.0, budget_sec)
+
+    @classmethod
+    def from_header(cls, value: Optional[str]) -> "Deadline":
+        """``X-Request-Deadline`` ヘッダ値からデッドラインを生成する。
+
+        ヘッダはUNIXエポックのミリ秒。未指定・不正値の場合は
+        ``REQUEST_BUDGET_SEC`` を用いる。いずれの場合も ``REQUEST_BUDGET_SEC``
+        を上限とする。
+
+        Args:
+            value: ヘッダ値（エポックミリ秒）
+
+        Returns:
+            Deadline: 生成したデッドライン
+        """
+        budget = float(settings.request_budget_sec)
+        if value:
+            try:
+                budget = min(budget, int(value) / 1000.0 - time.time())
+            except ValueError:
+                logger.warning("Invalid %s header: %r", DEADLINE_HEADER, value)
+        return cls(budget)
+
+    def remaining(self) -> float:
+        """残り時間（秒）を返す。期限切れの場合は0。"""
+        return max(0.0, self._expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """期限切れかどうか。"""
+        return self.remaining() <= 0.0
+
+    def call_timeout(self, cap_sec: float) -> float:
+        """1回の外部呼び出しに割り当てるタイムアウト（秒）を返す。
+
+        応答を返す余裕として ``DEADLINE_SAFETY_MARGIN_SEC`` を差し引く。
+
+        Args:
+            cap_sec: 呼び出し種別ごとの上限（例: ``LLM_TIMEOUT_SEC``）
+
+        Returns:
+            float: タイムアウト秒数（最低0.1秒）
+        """
+        usable = self.remaining() - settings.deadline_safety_margin_sec
+        return max(0.1, min(float(cap_sec), usable))
+
+    def agent_recursion_limit(self) -> int:
+        """ReActエージェントの recursion_limit を残り時間から導出する。
+
+        1ステップあたり ``AGENT_STEP_SEC`` 秒かかると見積もり、
+        ``AGENT_MAX_RECURSION`` を上限とする。最低でも検索なしで回答できる
+        3ステップは確保する。
+
+        Returns:
+            int: LangGraphに渡す recursion_limit
+        """
+        steps = math.floor(self.remaining() / settings.agent_step_sec)
+        return max(3, min(settings.agent_max_recursion, steps))
+
+
+def record_cancellation(reason: str) -> None:
+    """キャンセル件数を加算する。
+
+    Args:
+        reason: キャンセル理由
+    """
+    _cancellation_counts[reason] = _cancellation_counts.get(reason, 0) + 1
+    logger.warning(
+        "Request cancelled: reason=%s totals=%s", reason, _cancellation_counts
+    )
+
+
+def get_cancellation_counts() -> Dict[str, int]:
+    """キャンセル件数のスナップショットを返す。"""
+    return dict(_cancellation_counts)
+
+
+async def _wait_for_disconnect(request: Request, stop: asyncio.Event) -> None:
+    """クライアントが切断するまで（または stop がセットされるまで）待機する。
+
+    NOTE: is_disconnected() 内部の anyio CancelScope がタスクのキャンセルを
+    吸収することがあるため、キャンセルに加えて stop で確実に終了させる。
+    """
+    while not stop.is_set():
+        if await request.is_disconnected():
+            return
+        await asyncio.sleep(_DISCONNECT_POLL_SEC)
+
+
+async def run_with_deadline(
+    request: Request, deadline: Deadline, awaitable: Awaitable[T]
+) -> T:
+    """期限またはクライアント切断まで処理を実行し、超えたらキャンセルする。
+
+    Args:
+        request: 切断検知に用いるリクエスト
+        deadline: リクエストのデッドライン
+        awaitable: 実行する処理
+
+    Returns:
+        処理結果
+
+    Raises:
+        RequestCancelled: 期限切れまたはクライアント切断でキャンセルした場合
+    """
+    task = asyncio.ensure_future(awaitable)
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(_wait_for_disconnect(request, stop))
+    try:
+        # 呼び出し元のタイムアウトより前に504を返せるよう余裕を残して打ち切る
+        done, _ = await asyncio.wait(
+            {task, watcher},
+            timeout=max(0.0, deadline.remaining() - settings.deadline_safety_margin_sec),
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if task in done:
+            return task.result()
+
+        reason = "client_disconnected" if watcher in done else "deadline_exceeded"
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+        record_cancellation(reason)
+        raise RequestCancelled(reason)
+    finally:
+        stop.set()
+        watcher.cancel()
+        try:
+            await watcher
+        except (asyncio.CancelledError, Exception):
+            pass
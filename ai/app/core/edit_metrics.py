@@ -0,0 +1,104 @@
+"""旅程編集の出力トークン数・所要時間をモード（EDIT_MODE）別に集計する。
+
+プロセス内の集計値で、/health で公開する。
+patchモードで操作を適用できず全体再生成にフォールバックした編集は
+``patch_fallback`` として別に集計し、patchモード本来のコストと区別する。
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Union
+
+from langchain_core.callbacks import get_usage_metadata_callback
+
+logger = logging.getLogger(__name__)
+
+_totals: Dict[str, Dict[str, Union[int, float]]] = {}
+
+# 計測中の編集でフォールバックが起きた経路（measure_edit の内側でのみ有効）
+_fallback_path: ContextVar[Optional[Dict[str, Optional[str]]]] = ContextVar(
+    "edit_fallback_path", default=None
+)
+
+
+def _bucket(mode: str) -> Dict[str, Union[int, float]]:
+    """モード別の集計領域を返す（無ければ作成）。"""
+    return _totals.setdefault(
+        mode,
+        {"count": 0, "patch_fallbacks": 0, "output_tokens": 0, "latency_sec": 0.0},
+    )
+
+
+def record_edit(mode: str, output_tokens: int, latency_sec: float) -> None:
+    """旅程編集1件分の計測値を加算する。
+
+    Args:
+        mode: 集計先（full / patch / patch_fallback）
+        output_tokens: その編集で消費した出力トークン数（全LLM呼び出しの合計）
+        latency_sec: 所要時間（秒）
+    """
+    bucket = _bucket(mode)
+    bucket["count"] += 1
+    bucket["output_tokens"] += output_tokens
+    bucket["latency_sec"] += latency_sec
+    logger.info(
+        "edit_itinerary metrics: mode=%s output_tokens=%d latency=%.2fs",
+        mode, output_tokens, latency_sec,
+    )
+
+
+def record_patch_fallback(path: str) -> None:
+    """差分編集の操作が適用できず全体再生成にフォールバックしたことを記録する。
+
+    Args:
+        path: フォールバックが起きた経路（rag_react / rag_plan_parallel / simple）
+    """
+    _bucket("patch")["patch_fallbacks"] += 1
+    state = _fallback_path.get()
+    if state is not None:
+        state["path"] = path
+    logger.warning("patch fallback to full regeneration: path=%s", path)
+
+
+@contextmanager
+def measure_edit(mode: str) -> Iterator[None]:
+    """旅程編集1件の出力トークン数と所要時間を計測して記録する。
+
+    ブロック内で record_patch_fallback が呼ばれた場合は ``patch_fallback`` として記録する。
+    例外（キャンセル含む）で抜けた場合は記録しない。
+
+    Args:
+        mode: 設定上の編集モード（full / patch）
+    """
+    state: Dict[str, Optional[str]] = {"path": None}
+    token = _fallback_path.set(state)
+    started = time.perf_counter()
+    try:
+        with get_usage_metadata_callback() as usage_cb:
+            yield
+    finally:
+        _fallback_path.reset(token)
+    output_tokens = sum(
+        usage.get("output_tokens", 0) for usage in usage_cb.usage_metadata.values()
+    )
+    record_edit(
+        f"{mode}_fallback" if state["path"] else mode,
+        output_tokens,
+        time.perf_counter() - started,
+    )
+
+
+def get_edit_metrics() -> Dict[str, Dict[str, Union[int, float]]]:
+    """モード別の件数と平均出力トークン数・平均所要時間を返す。"""
+    summary: Dict[str, Dict[str, Union[int, float]]] = {}
+    for mode, bucket in _totals.items():
+        count = bucket["count"] or 1
+        summary[mode] = {
+            "count": bucket["count"],
+            "patch_fallbacks": bucket["patch_fallbacks"],
+            "avg_output_tokens": round(bucket["output_tokens"] / count, 1),
+            "avg_latency_sec": round(bucket["latency_sec"] / count, 2),
+        }
+    return summary
@@ -7,6 +7,7 @@ from .ai import (
     EventsCompleteRequest,
     ItineraryEditRequest,
     ItineraryEditResponse,
+    ItineraryEditPatch,
 )
 
 __all__ = [
@@ -16,4 +17,5 @@ __all__ = [
     "EventsCompleteRequest",
     "ItineraryEditRequest",
     "ItineraryEditResponse",
+    "ItineraryEditPatch",
 ]
@@ -1,7 +1,7 @@
 """AI関連のPydanticモデル（既存OpenAPI仕様に準拠）。"""
 
 from pydantic import BaseModel, Field
-from typing import List, Optional, Union, Dict, Any
+from typing import List, Optional, Union, Dict, Any, Literal, Annotated
 
 
 class Event(BaseModel):
@@ -45,3 +45,55 @@ class ItineraryEditResponse(BaseModel):
     changeDescription: str
 
 
+# ===== 差分編集（EDIT_MODE=patch）用の操作モデル =====
+# day / index は0始まり。操作は先頭から順に適用し、各操作の位置は直前までの適用結果に対するもの。
+
+
+class AddEventOp(BaseModel):
+    op: Literal["add_event"]
+    day: int = Field(..., ge=0, description="対象日のインデックス")
+    index: Optional[int] = Field(default=None, ge=0, description="挿入位置（省略時は末尾）")
+    event: Event
+
+
+class RemoveEventOp(BaseModel):
+    op: Literal["remove_event"]
+    day: int = Field(..., ge=0, description="対象日のインデックス")
+    index: int = Field(..., ge=0, description="削除するイベントの位置")
+
+
+class ReplaceEventOp(BaseModel):
+    op: Literal["replace_event"]
+    day: int = Field(..., ge=0, description="対象日のインデックス")
+    index: int = Field(..., ge=0, description="置換するイベントの位置")
+    event: Event
+
+
+class AddDayOp(BaseModel):
+    op: Literal["add_day"]
+    index: Optional[int] = Field(default=None, ge=0, description="挿入位置（省略時は末尾）")
+    day: Day
+
+
+class RemoveDayOp(BaseModel):
+    op: Literal["remove_day"]
+    day: int = Field(..., ge=0, description="削除する日のインデックス")
+
+
+class UpdateItineraryOp(BaseModel):
+    op: Literal["update_itinerary"]
+    title: Optional[str] = Field(default=None, description="新しいタイトル")
+    subtitle: Optional[str] = Field(default=None, description="新しいサブタイトル")
+    description: Optional[str] = Field(default=None, description="新しい旅程説明")
+
+
+ItineraryEditOp = Annotated[
+    Union[AddEventOp, RemoveEventOp, ReplaceEventOp, AddDayOp, RemoveDayOp, UpdateItineraryOp],
+    Field(discriminator="op"),
+]
+
+
+class ItineraryEditPatch(BaseModel):
+    """差分編集モードでLLMが返す出力。"""
+    operations: List[ItineraryEditOp] = Field(..., description="適用する操作の一覧")
+    changeDescription: str
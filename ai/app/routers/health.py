@@ -2,8 +2,10 @@
 
 from fastapi import APIRouter
 from pydantic import BaseModel
-from typing import Dict
+from typing import Dict, Union
 from app.core.config import settings
+from app.core.deadline import get_cancellation_counts
+from app.core.edit_metrics import get_edit_metrics
 
 router = APIRouter()
 
@@ -15,6 +17,8 @@ class HealthResponse(BaseModel):
     service: str = "fastapi-sidecar"
     version: str = "0.1.0"
     environment_variables: Dict[str, str] = {}
+    cancellations: Dict[str, int] = {}
+    edit_metrics: Dict[str, Dict[str, Union[int, float]]] = {}
 
 
 
@@ -23,10 +27,11 @@ def health_check() -> HealthResponse:
     """ヘルスチェックエンドポイント
     
     FastAPI 内部サービスの稼働状況を確認する。
-    環境変数の設定状況も含めて返す。
+    環境変数の設定状況と、期限切れ/切断によるキャンセル件数、
+    編集モード別の出力トークン数・所要時間も含めて返す。
     
     Returns:
-        HealthResponse: サービス状態情報と環境変数設定状況
+        HealthResponse: サービス状態情報、環境変数設定状況、キャンセル件数、編集メトリクス
         
     Example:
         >>> response = health_check()
@@ -40,4 +45,9 @@ def health_check() -> HealthResponse:
         "TAVILY_API_KEY": "***masked***" if settings.tavily_api_key else "not set",
     }
     
-    return HealthResponse(status="ok", environment_variables=env_vars)
+    return HealthResponse(
+        status="ok",
+        environment_variables=env_vars,
+        cancellations=get_cancellation_counts(),
+        edit_metrics=get_edit_metrics(),
+    )
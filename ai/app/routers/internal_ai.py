@@ -1,19 +1,42 @@
 """内部専用 AI ルータ（/internal/ai/*）。"""
 
-from fastapi import APIRouter
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request
 from app.models.ai import (
     EventsCompleteRequest,
     ItineraryEditRequest,
     ItineraryEditResponse,
     Event,
 )
+from app.core.deadline import (
+    DEADLINE_HEADER,
+    Deadline,
+    RequestCancelled,
+    run_with_deadline,
+)
 from app.services.ai_langchain import complete_event, edit_itinerary
 
 
 router = APIRouter(prefix="/internal/ai")
 
+
+def _cancelled_to_http(e: RequestCancelled) -> HTTPException:
+    """キャンセル理由をHTTPエラーに変換する。
+
+    期限切れは504、クライアント切断は499（nginx慣習、応答は届かない）とする。
+    """
+    if e.reason == "client_disconnected":
+        return HTTPException(status_code=499, detail="client_disconnected")
+    return HTTPException(status_code=504, detail="deadline_exceeded")
+
+
 @router.post("/events-complete", response_model=Event)
-def events_complete(body: EventsCompleteRequest) -> Event:
+async def events_complete(
+    body: EventsCompleteRequest,
+    request: Request,
+    x_request_deadline: Optional[str] = Header(default=None, alias=DEADLINE_HEADER),
+) -> Event:
     """イベント補完（内部用）。"""
 
     if body.dummy:
@@ -25,7 +48,15 @@ def events_complete(body: EventsCompleteRequest) -> Event:
             icon="mdi-train",
         )
 
-    result = complete_event(body.event1.model_dump(), body.event2.model_dump())
+    deadline = Deadline.from_header(x_request_deadline)
+    try:
+        result = await run_with_deadline(
+            request,
+            deadline,
+            complete_event(body.event1.model_dump(), body.event2.model_dump(), deadline),
+        )
+    except RequestCancelled as e:
+        raise _cancelled_to_http(e) from e
     return Event(**result)
 
 
@@ -33,13 +64,25 @@ def events_complete(body: EventsCompleteRequest) -> Event:
     "/itinerary-edit",
     response_model=ItineraryEditResponse,
 )
-def itinerary_edit(body: ItineraryEditRequest) -> ItineraryEditResponse:
+async def itinerary_edit(
+    body: ItineraryEditRequest,
+    request: Request,
+    x_request_deadline: Optional[str] = Header(default=None, alias=DEADLINE_HEADER),
+) -> ItineraryEditResponse:
     """旅程編集（内部用）。
     
     NOTE: Python側はシンプルに保ち、サニタイズやバリデーションはTypeScript側で受け持つ。
     diffPatchはTypeScript側で生成するため、Python側では返さない。
+    期限（X-Request-Deadline）超過・クライアント切断時は処理をキャンセルする。
     """
 
-    result = edit_itinerary(body.originalItinerary.model_dump(), body.editPrompt)
+    deadline = Deadline.from_header(x_request_deadline)
+    try:
+        result = await run_with_deadline(
+            request,
+            deadline,
+            edit_itinerary(body.originalItinerary.model_dump(), body.editPrompt, deadline),
+        )
+    except RequestCancelled as e:
+        raise _cancelled_to_http(e) from e
     return ItineraryEditResponse(**result)
-
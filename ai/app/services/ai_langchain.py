@@ -1,6 +1,7 @@
 """LangChainベースのAIサービス実装。"""
 
 from typing import Any, Optional, List, Dict, Literal, Annotated
+import asyncio
 import re
 import logging
 import requests
@@ -10,6 +11,10 @@ from openai import RateLimitError
 
 
 from app.core.config import settings
+from app.core.deadline import Deadline
+from app.core.edit_metrics import measure_edit, record_patch_fallback
+from app.models.ai import Itinerary
+from app.services.itinerary_patch import PatchApplyError, apply_itinerary_ops, parse_edit_patch
 
 logger = logging.getLogger(__name__)
 
@@ -21,9 +26,79 @@ from langchain_tavily import TavilySearch
 from langgraph.prebuilt import create_react_agent
 
 
-def check_tavily_usage() -> Optional[Dict[str, Any]]:
+# イベントのiconとして許可する値の指示
+ICON_INSTRUCTIONS = (
+    'iconは必ず以下のいずれかで返してください。\n'
+    '- "mdi-map-marker"\n'
+    '- "mdi-walk"\n'
+    '- "mdi-train"\n'
+    '- "mdi-bike"\n'
+    '- "mdi-bus"\n'
+    '- "mdi-airplane"\n'
+    '- "mdi-camera"\n'
+    '- "mdi-food"\n'
+    '- "mdi-car"\n'
+)
+
+# RAG系の最終生成で共通して用いる出力形式の指示
+RAG_OUTPUT_INSTRUCTIONS = (
+    '最終的にJSONオブジェクト1つのみを返してください（コードフェンスや説明文は不可）。\n'
+    + ICON_INSTRUCTIONS +
+    'キーは modifiedItinerary, changeDescription のみ。\n'
+    'modifiedItineraryは以下の形式です。\n'
+    '{\n'
+    '    "title": "旅行のタイトル",\n'
+    '    "subtitle": "旅行のサブタイトル",\n'
+    '    "description": "旅行の概要説明",\n'
+    '    "days": [\n'
+    '        {\n'
+    '        "date": "YYYY-MM-DD",\n'
+    '        "events": [\n'
+    '            { \n'
+    '            "title": "イベント名", \n'
+    '            "time": "HH:MM", \n'
+    '            "end_time": "HH:MM", \n'
+    '            "description": "イベントの詳細説明", \n'
+    '            "icon": "mdi-アイコン名" \n'
+    '            }\n'
+    '        ]\n'
+    '        }\n'
+    '    ]\n'
+    '}\n'
+    '\n'
+)
+
+# 差分編集（EDIT_MODE=patch）で用いる出力形式の指示
+PATCH_OUTPUT_INSTRUCTIONS = (
+    '最終的にJSONオブジェクト1つのみを返してください（コードフェンスや説明文は不可）。\n'
+    '旅程全体は返さず、元の旅程に対する変更操作の一覧だけを返してください。\n'
+    'キーは operations, changeDescription のみ。\n'
+    'day, index は0始まり。操作は先頭から順に適用され、位置は直前までの操作を適用した後の旅程に対するものです。\n'
+    'operationsの要素は以下のいずれかです。\n'
+    '- {"op": "add_event", "day": 日, "index": 挿入位置（省略時は末尾）, "event": イベント}\n'
+    '- {"op": "remove_event", "day": 日, "index": 位置}\n'
+    '- {"op": "replace_event", "day": 日, "index": 位置, "event": イベント}\n'
+    '- {"op": "add_day", "index": 挿入位置（省略時は末尾）, "day": {"date": "YYYY-MM-DD", "events": [イベント, ...]}}\n'
+    '- {"op": "remove_day", "day": 日}\n'
+    '- {"op": "update_itinerary", "title": "新タイトル", "subtitle": "新サブタイトル", "description": "新しい概要説明"}（変更する項目のみ）\n'
+    'イベントは {"title": "イベント名", "time": "HH:MM", "end_time": "HH:MM", "description": "イベントの詳細説明", "icon": "mdi-アイコン名"} の形式です。\n'
+    + ICON_INSTRUCTIONS +
+    '\n'
+)
+
+# 編集モードごとの（出力形式の指示, 出力キー）
+EDIT_OUTPUT_FORMATS: Dict[str, tuple[str, str]] = {
+    "full": (RAG_OUTPUT_INSTRUCTIONS, "modifiedItinerary, changeDescription"),
+    "patch": (PATCH_OUTPUT_INSTRUCTIONS, "operations, changeDescription"),
+}
+
+
+def check_tavily_usage(timeout: float = 10) -> Optional[Dict[str, Any]]:
     """Tavily APIの使用状況をチェックする。
     
+    Args:
+        timeout: HTTPタイムアウト（秒）
+
     Returns:
         API使用状況の情報、またはエラーの場合はNone
     """
@@ -33,7 +108,7 @@ def check_tavily_usage() -> Optional[Dict[str, Any]]:
     
     try:
         headers = {"Authorization": f"Bearer {settings.tavily_api_key.get_secret_value()}"}
-        response = requests.get("https://api.tavily.com/usage", headers=headers, timeout=10)
+        response = requests.get("https://api.tavily.com/usage", headers=headers, timeout=timeout)
         
         if response.status_code == 200:
             usage_data = response.json()
@@ -48,6 +123,19 @@ def check_tavily_usage() -> Optional[Dict[str, Any]]:
         return None
 
 
+def strip_code_fences(text: str) -> str:
+    """LLM出力を囲むコードフェンス（```json ... ```）を取り除く。
+
+    Args:
+        text: LLMの出力
+
+    Returns:
+        フェンスを除いた文字列（フェンスが無ければ前後の空白のみ除去）
+    """
+    match = re.fullmatch(r"\s*```[\w-]*\s*\n?(.*?)\n?\s*```\s*", text, re.DOTALL)
+    return (match.group(1) if match else text).strip()
+
+
 def sanitize_user_text(text: str) -> str:
     """ユーザー入力を簡易サニタイズする（長さ・制御文字・HTML/URL）。
 
@@ -67,11 +155,17 @@ def sanitize_user_text(text: str) -> str:
     return no_urls.strip()
 
 
-def create_llm() -> Any:
+def create_llm(timeout: Optional[float] = None, max_retries: Optional[int] = None) -> Any:
     """LLMインスタンスを生成する。Cerebras優先でOpenAI互換を利用。
 
     優先順位: Cerebrasが設定されていればCerebrasを使用。無ければOpenAI設定を使用。
+
+    Args:
+        timeout: 1回のLLM呼び出しのタイムアウト（秒）。未指定時は ``LLM_TIMEOUT_SEC``。
+        max_retries: OpenAIクライアントの自動リトライ回数。未指定時はクライアント既定値。
     """
+    if timeout is None:
+        timeout = settings.llm_timeout_sec
     
     
     # Cerebras or OpenAI
@@ -89,11 +183,12 @@ def create_llm() -> Any:
     except UnicodeEncodeError as e:
         raise RuntimeError("LLM API key contains non-ASCII characters") from e
     logger.info(
-        "create_llm: initializing ChatOpenAI (provider=%s, model=%s, temperature=%s, timeout=%s)",
+        "create_llm: initializing ChatOpenAI (provider=%s, model=%s, temperature=%s, timeout=%s, max_retries=%s)",
         "cerebras" if use_cerebras else "openai",
         settings.cerebras_model if use_cerebras else settings.openai_model,
         0 if use_cerebras else settings.openai_temperature,
-        settings.llm_timeout_sec,
+        timeout,
+        max_retries,
     )
     if use_cerebras:
         # CerebrasはOpenAI互換。未対応のパラメータに注意（presence/frequency等）。
@@ -102,28 +197,88 @@ def create_llm() -> Any:
             api_key=api_key,  # type: ignore[arg-type]
             base_url=settings.cerebras_base_url,
             temperature=0,
-            timeout=settings.llm_timeout_sec,
+            timeout=timeout,
+            max_retries=max_retries,
         )
     else:
         return ChatOpenAI(
             model=settings.openai_model,
             temperature=settings.openai_temperature,
             api_key=api_key,  # type: ignore[arg-type]
-            timeout=settings.llm_timeout_sec,
+            timeout=timeout,
+            max_retries=max_retries,
         )
 
-def make_tavily_capped_tool(max_per_run: int = 3) -> StructuredTool:
+
+def create_deadline_llm(deadline: Deadline) -> Any:
+    """リクエスト期限に合わせたLLMインスタンスを生成する。
+
+    タイムアウトは生成時点の残り時間から決める。自動リトライはタイムアウトを
+    積み増して期限を超えるため無効にする（失敗時はRAG→通常チェーンの
+    フォールバックや ``run_with_deadline`` の打ち切りに任せる）。
+    1リクエスト内で複数回呼び出す場合は、呼び出しごとに生成し直すこと。
+
+    Args:
+        deadline: リクエスト期限
+
+    Returns:
+        ChatOpenAI互換のLLMインスタンス
+    """
+    return create_llm(timeout=deadline.call_timeout(settings.llm_timeout_sec), max_retries=0)
+
+
+async def tavily_search(
+    query: str,
+    deadline: Optional[Deadline] = None,
+    max_results: int = 5,
+    depth: Literal["basic", "advanced"] = "basic",
+) -> Any:
+    """Tavily検索を1回実行する（タイムアウトつき）。
+
+    Args:
+        query: 検索クエリ
+        deadline: リクエスト期限。指定時は残り時間から検索のタイムアウトを決める
+        max_results: 最大検索結果数
+        depth: 検索深度
+
+    Returns:
+        検索結果。タイムアウト時はその旨を示す1件のリスト
+    """
+    timeout = (
+        deadline.call_timeout(settings.tavily_timeout_sec)
+        if deadline
+        else settings.tavily_timeout_sec
+    )
+    try:
+        return await asyncio.wait_for(
+            TavilySearch(
+                max_results=max_results,
+                include_answer=True,
+                include_raw_content=False,
+                search_depth=depth,
+            ).ainvoke(query),
+            timeout=timeout,
+        )
+    except asyncio.TimeoutError:
+        logger.warning("tavily_search timed out after %.1fs query=%r", timeout, query)
+        return [{"url":"", "content":"[tavily] 検索がタイムアウトしました。"}]
+
+
+def make_tavily_capped_tool(
+    max_per_run: int = 3, deadline: Optional[Deadline] = None
+) -> StructuredTool:
     """回数上限付きのTavily検索ツールを生成する。
     
     Args:
         max_per_run (int): 1回の実行内で許容する呼び出し回数の上限
+        deadline (Optional[Deadline]): リクエスト期限。指定時は残り時間から検索のタイムアウトを決める
         
     Returns:
         StructuredTool: エージェントが利用可能な検索ツール
     """
     used = 0
 
-    def tavily_search_capped(
+    async def tavily_search_capped(
         query: Annotated[str, "検索クエリ"],
         max_results: Annotated[int, "最大検索結果数"] = 5,
         depth: Annotated[Literal["basic", "advanced"], "検索深度"] = "basic",
@@ -135,25 +290,26 @@ def make_tavily_capped_tool(max_per_run: int = 3) -> StructuredTool:
         logger.info("tavily_search_capped CALL %s/%s depth=%s max_results=%s query=%r", used + 1, max_per_run, depth, max_results, query)
 
         used += 1
-        return TavilySearch(
-            max_results=max_results,
-            include_answer=True,
-            include_raw_content=False,
-            search_depth=depth,
-        ).invoke(query)
+        return await tavily_search(query, deadline, max_results=max_results, depth=depth)
 
     # StructuredToolを使用して明示的にツールを定義
     return StructuredTool.from_function(
-        func=tavily_search_capped,
+        coroutine=tavily_search_capped,
         name="tavily_search_capped",
         description="Tavily検索（1実行あたりの回数上限つき）"
     )
 
 
-def complete_event(event1: dict, event2: dict) -> dict:
-    """2イベントの間を補完するイベントを生成する。"""
+async def complete_event(event1: dict, event2: dict, deadline: Deadline) -> dict:
+    """2イベントの間を補完するイベントを生成する。
+
+    Args:
+        event1: 前のイベント
+        event2: 後のイベント
+        deadline: リクエスト期限。LLM呼び出しのタイムアウトに用いる
+    """
 
-    llm = create_llm()
+    llm = create_deadline_llm(deadline)
     prompt = ChatPromptTemplate.from_messages([
         ("system",
             "あなたは旅程作成の専門家です。出力は必ず1つのJSONオブジェクトのみ。\n"
@@ -182,7 +338,7 @@ def complete_event(event1: dict, event2: dict) -> dict:
     # レート制限エラーに対応した安全な呼び出し
     try:
         chain = prompt | llm | StrOutputParser()
-        raw = chain.invoke({"event1": event1, "event2": event2})
+        raw = await chain.ainvoke({"event1": event1, "event2": event2})
         logger.debug("complete_event raw response: %r", raw)
     except RateLimitError as e:
         logger.exception("complete_event: レート制限エラー")
@@ -221,22 +377,92 @@ def complete_event(event1: dict, event2: dict) -> dict:
         }
 
 
-def edit_itinerary(itinerary: dict, edit_prompt: str) -> dict:
+def build_edit_result(raw: str, itinerary: dict, mode: str, label: str) -> dict:
+    """LLM出力から旅程編集の結果（modifiedItinerary, changeDescription）を組み立てる。
+
+    Args:
+        raw: LLMの出力（JSON文字列）
+        itinerary: 元の旅程
+        mode: 編集モード（full / patch）
+        label: ログ出力用の呼び出し元名
+
+    Returns:
+        dict: modifiedItinerary, changeDescription
+
+    Raises:
+        PatchApplyError: patchモードで操作の検証・適用に失敗した場合
+    """
+    import json
+
+    if mode == "patch":
+        patch = parse_edit_patch(raw)
+        modified = apply_itinerary_ops(Itinerary.model_validate(itinerary), patch.operations)
+        logger.info("%s applied %d operations", label, len(patch.operations))
+        return {
+            "modifiedItinerary": modified.model_dump(),
+            "changeDescription": patch.changeDescription,
+        }
+
+    try:
+        obj = json.loads(raw)
+        return {
+            "modifiedItinerary": obj.get("modifiedItinerary", itinerary),
+            "changeDescription": obj.get("changeDescription", "変更を適用しました"),
+        }
+    except Exception as e:
+        logger.warning(
+            "%s JSON parse failed: %s | raw=%r", label, e, raw
+        )
+        return {
+            "modifiedItinerary": itinerary,
+            "changeDescription": "変更を適用しました",
+        }
+
+
+async def edit_itinerary(itinerary: dict, edit_prompt: str, deadline: Deadline) -> dict:
     """旅程編集リクエストに基づく更新を生成する（シンプル化）。
     
     NOTE: Python側はシンプルに保ち、サニタイズやバリデーションはTypeScript側で受け持つ。
     diffPatchはTypeScript側で生成するため、Python側では返さない。
+
+    EDIT_MODE=patch の場合は変更操作の一覧を出力させて元の旅程に適用し、
+    適用できなければ全体再生成にフォールバックする。
+    出力トークン数と所要時間はモード別に記録する。
+
+    Args:
+        itinerary: 元の旅程
+        edit_prompt: 編集指示
+        deadline: リクエスト期限。RAG・LLM呼び出しの予算に用いる
     """
 
+    mode = settings.edit_mode
+    with measure_edit(mode):
+        return await _edit_itinerary(itinerary, edit_prompt, deadline, mode)
+
+
+async def _edit_itinerary(itinerary: dict, edit_prompt: str, deadline: Deadline, mode: str) -> dict:
+    """edit_itinerary の本体（RAG → 通常チェーンの順に試行する）。"""
+
     # RAGが有効ならRAG経由で試行し、失敗時は従来ロジックにフォールバック
     if settings.rag_enable and settings.tavily_api_key:
         # Tavily API使用状況のデバッグチェック
         logger.info("=== TAVILY API USAGE CHECK (edit_itinerary) ===")
-        tavily_usage = check_tavily_usage()
+        tavily_usage = await asyncio.to_thread(
+            check_tavily_usage, deadline.call_timeout(settings.tavily_timeout_sec)
+        )
         if tavily_usage:
             logger.info("Tavily API is available, proceeding with RAG")
             try:
-                return rag_edit_itinerary(itinerary, edit_prompt)
+                if settings.rag_mode == "plan_parallel":
+                    # patch適用失敗時は検索結果を再利用して全体再生成する（関数内で処理）
+                    return await rag_plan_edit_itinerary(itinerary, edit_prompt, deadline, mode)
+                try:
+                    return await rag_edit_itinerary(itinerary, edit_prompt, deadline, mode)
+                except PatchApplyError as e:
+                    # 検索に基づく編集を保つため、通常チェーンではなくRAGをfullモードで再実行する
+                    logger.warning("RAG(react) patch could not be applied: %s", e)
+                    record_patch_fallback("rag_react")
+                    return await rag_edit_itinerary(itinerary, edit_prompt, deadline, "full")
             except Exception as e:
                 import traceback
                 tb_str = traceback.format_exc()
@@ -248,9 +474,43 @@ def edit_itinerary(itinerary: dict, edit_prompt: str) -> dict:
             logger.warning("Tavily API usage check failed, falling back to simple chain")
             # RAGをスキップして通常のチェーンに進む
 
-    llm = create_llm()
+    if mode == "patch":
+        try:
+            return await simple_edit_itinerary(itinerary, edit_prompt, deadline, "patch")
+        except PatchApplyError as e:
+            logger.warning("Patch could not be applied: %s", e)
+            record_patch_fallback("simple")
+    return await simple_edit_itinerary(itinerary, edit_prompt, deadline, "full")
+
+
+async def simple_edit_itinerary(
+    itinerary: dict, edit_prompt: str, deadline: Deadline, mode: str = "full"
+) -> dict:
+    """RAGを使わず、1回のLLM呼び出しで旅程を編集する。
+
+    Args:
+        itinerary: 元の旅程
+        edit_prompt: 編集指示
+        deadline: リクエスト期限。LLM呼び出しのタイムアウトに用いる
+        mode: 編集モード（full: 旅程全体を再生成 / patch: 変更操作の一覧を生成）
+
+    Returns:
+        dict: modifiedItinerary, changeDescription
+
+    Raises:
+        PatchApplyError: patchモードで操作の検証・適用に失敗した場合
+    """
+
+    llm = create_deadline_llm(deadline)
     # NOTE: サニタイズはTypeScript側で受け持つため、Python側では簡易的な処理のみ
     safe_prompt = sanitize_user_text(edit_prompt)
+    if mode == "patch":
+        # 出力形式の指示は "{" を含むため、テンプレート変数として渡す
+        system_keys = "operations, changeDescription"
+        output_instructions = PATCH_OUTPUT_INSTRUCTIONS + "出力: operations, changeDescription"
+    else:
+        system_keys = "modifiedItinerary, changeDescription"
+        output_instructions = "出力: modifiedItinerary, changeDescription"
     prompt = ChatPromptTemplate.from_messages(
         [
             (
@@ -258,7 +518,7 @@ def edit_itinerary(itinerary: dict, edit_prompt: str) -> dict:
                 (
                     "あなたは旅程編集の専門家です。出力は必ず1つのJSONオブジェクトのみ。"
                     "コードフェンス（```）や説明文は一切含めないでください。"
-                    "キーは modifiedItinerary, changeDescription のみ。"
+                    f"キーは {system_keys} のみ。"
                 ),
             ),
             (
@@ -266,7 +526,7 @@ def edit_itinerary(itinerary: dict, edit_prompt: str) -> dict:
                 (
                     "元の旅程: {itinerary}\n"
                     "編集指示: {edit_prompt}\n"
-                    "出力: modifiedItinerary, changeDescription"
+                    "{output_instructions}"
                 ),
             ),
         ]
@@ -274,7 +534,13 @@ def edit_itinerary(itinerary: dict, edit_prompt: str) -> dict:
     # レート制限エラーに対応した安全な呼び出し
     try:
         chain = prompt | llm | StrOutputParser()
-        raw = chain.invoke({"itinerary": itinerary, "edit_prompt": safe_prompt})
+        raw = await chain.ainvoke(
+            {
+                "itinerary": itinerary,
+                "edit_prompt": safe_prompt,
+                "output_instructions": output_instructions,
+            }
+        )
         logger.debug("edit_itinerary raw response: %r", raw)
     except RateLimitError as e:
         logger.exception("edit_itinerary: レート制限エラー")
@@ -284,28 +550,19 @@ def edit_itinerary(itinerary: dict, edit_prompt: str) -> dict:
             "changeDescription": "申し訳ございません。現在AIサービスが高負荷のため、旅程の編集ができませんでした。しばらく時間をおいてから再度お試しください。"
         }
 
-    import json
-    try:
-        obj = json.loads(raw)
-        return {
-            "modifiedItinerary": obj.get("modifiedItinerary", itinerary),
-            "changeDescription": obj.get("changeDescription", "変更を適用しました"),
-        }
-    except Exception as e:
-        logger.warning(
-            "edit_itinerary JSON parse failed: %s | raw=%r", e, raw
-        )
-        return {
-            "modifiedItinerary": itinerary,
-            "changeDescription": "変更を適用しました",
-        }
+    return build_edit_result(raw, itinerary, mode, "edit_itinerary")
 
 
-def rag_edit_itinerary(itinerary: dict, edit_prompt: str) -> dict:
+async def rag_edit_itinerary(
+    itinerary: dict, edit_prompt: str, deadline: Deadline, mode: str = "full"
+) -> dict:
     """RAGを用いて旅程を編集する。
 
     - Cerebras/OpenAI互換のLLM + Tavilyツール + ReActエージェント。
     - 返却スキーマは従来通り（modifiedItinerary, changeDescription）。
+    - LLM/検索のタイムアウトとエージェントのステップ上限は残り時間から導出する。
+    - mode=patch の場合は変更操作の一覧を出力させて適用する（失敗時は PatchApplyError）。
+    - Tavily APIの使用状況チェックは呼び出し元（edit_itinerary）で1回だけ行う。
     """
 
     # ログ出力テスト
@@ -320,16 +577,6 @@ def rag_edit_itinerary(itinerary: dict, edit_prompt: str) -> dict:
         settings.tavily_max_per_run
     )
     
-    # Tavily API使用状況のデバッグチェック
-    logger.info("=== TAVILY API USAGE CHECK ===")
-    tavily_usage = check_tavily_usage()
-    if tavily_usage:
-        logger.info("Tavily API is available and working")
-    else:
-        logger.warning("Tavily API usage check failed or API key not configured")
-
-    llm = create_llm()
-    logger.info("LLM created for RAG: %s", type(llm).__name__)
     # # Tavily APIキーは環境変数からlangchain_communityが内部で参照する
     # # 制限回数は設定値から
     # # カスタムツール（strict=True）を使用してReActエージェントとの互換性を確保
@@ -339,61 +586,45 @@ def rag_edit_itinerary(itinerary: dict, edit_prompt: str) -> dict:
     # Tavily APIキーは環境変数からlangchain_communityが内部で参照する
     # 制限回数は設定値から
     # カスタムツール（PoCと同じ方式）を使用してReActエージェントとの互換性を確保
-    tavily = make_tavily_capped_tool(max_per_run=max(0, int(settings.tavily_max_per_run)))
+    tavily = make_tavily_capped_tool(
+        max_per_run=max(0, int(settings.tavily_max_per_run)), deadline=deadline
+    )
     logger.info("Tavily tool created with max_per_run=%s", max(0, int(settings.tavily_max_per_run)))
 
-    agent = create_react_agent(llm, tools=[tavily])
+    tools = [tavily]
+
+    def select_model(state: Any, runtime: Any) -> Any:
+        """エージェントの各ターンで残り時間からタイムアウトを決め直したLLMを返す。"""
+        return create_deadline_llm(deadline).bind_tools(tools)
+
+    agent = create_react_agent(select_model, tools=tools)
     # logger.info("ReAct agent created with tools: %s", [tavily.name])
 
     # 入力構築（日本語での明確な指示）
     safe_prompt = sanitize_user_text(edit_prompt)
     # より明確な検索指示に変更
 
+    output_instructions, output_keys = EDIT_OUTPUT_FORMATS[mode]
     question = (
         '検索結果を参考にして、旅程を改善してください。\n'
-        '最終的にJSONオブジェクト1つのみを返してください（コードフェンスや説明文は不可）。\n'
-        'iconは必ず以下のいずれかで返してください。\n'
-        '- "mdi-map-marker"\n'
-        '- "mdi-walk"\n'
-        '- "mdi-train"\n'
-        '- "mdi-bike"\n'
-        '- "mdi-bus"\n'
-        '- "mdi-airplane"\n'
-        '- "mdi-camera"\n'
-        '- "mdi-food"\n'
-        '- "mdi-car"\n'
-        'キーは modifiedItinerary, changeDescription のみ。\n'
-        'modifiedItineraryは以下の形式です。\n'
-        '{\n'
-        '    "title": "旅行のタイトル",\n'
-        '    "subtitle": "旅行のサブタイトル",\n'
-        '    "description": "旅行の概要説明",\n'
-        '    "days": [\n'
-        '        {\n'
-        '        "date": "YYYY-MM-DD",\n'
-        '        "events": [\n'
-        '            { \n'
-        '            "title": "イベント名", \n'
-        '            "time": "HH:MM", \n'
-        '            "end_time": "HH:MM", \n'
-        '            "description": "イベントの詳細説明", \n'
-        '            "icon": "mdi-アイコン名" \n'
-        '            }\n'
-        '        ]\n'
-        '        }\n'
-        '    ]\n'
-        '}\n'
-        '\n'
+        f'{output_instructions}'
         f'元の旅程: {itinerary}\n'
         f'編集指示: {safe_prompt}\n'
-        '出力: modifiedItinerary, changeDescription'
+        f'出力: {output_keys}'
     )
 
     logger.info("Starting RAG agent invocation with question length: %d", len(question))
     logger.debug("RAG question: %s", question)
 
+    # ステップ上限は残り時間から導出（超過時はGraphRecursionErrorで通常チェーンへフォールバック）
+    recursion_limit = deadline.agent_recursion_limit()
+    logger.info("RAG agent recursion_limit=%d (remaining=%.1fs)", recursion_limit, deadline.remaining())
+
     # テンプレート変数を適切に渡す
-    result = agent.invoke({"messages": [("user", question)]})
+    result = await agent.ainvoke(
+        {"messages": [("user", question)]},
+        config={"recursion_limit": recursion_limit},
+    )
     
     # エージェントの全メッセージをログ出力
     if isinstance(result, dict) and "messages" in result:
@@ -404,18 +635,119 @@ def rag_edit_itinerary(itinerary: dict, edit_prompt: str) -> dict:
     final_text = result["messages"][-1].content if isinstance(result, dict) else ""
     logger.info("Final agent response length: %d", len(final_text))
 
+    return build_edit_result(final_text, itinerary, mode, "rag_edit_itinerary")
+
+
+async def rag_plan_edit_itinerary(
+    itinerary: dict, edit_prompt: str, deadline: Deadline, mode: str = "full"
+) -> dict:
+    """検索計画→並列検索→一括生成の3段階で旅程を編集する（RAG_MODE=plan_parallel）。
+
+    ReActエージェントのように「LLM→検索→LLM」を繰り返さず、
+    1回の計画呼び出しで検索クエリをまとめて決め、Tavily検索を並列に実行し、
+    1回の生成呼び出しで modifiedItinerary, changeDescription を得る。
+    patchモードで操作を適用できない場合は、検索結果を再利用して最終生成のみfullモードでやり直す。
+
+    Args:
+        itinerary: 元の旅程
+        edit_prompt: 編集指示
+        deadline: リクエスト期限。LLM/検索のタイムアウトに用いる
+        mode: 編集モード（full / patch）
+
+    Returns:
+        dict: modifiedItinerary, changeDescription
+
+    Raises:
+        ValueError: 検索計画の出力を解釈できない場合
+    """
     import json
+
+    started = time.perf_counter()
+    max_queries = max(0, int(settings.tavily_max_per_run))
+    safe_prompt = sanitize_user_text(edit_prompt)
+
+    # 1. 検索計画（クエリをまとめて生成）
+    plan_llm = create_deadline_llm(deadline)
+    plan_prompt = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                (
+                    "あなたは旅程編集のための検索プランナーです。出力は必ず1つのJSONオブジェクトのみ。"
+                    "コードフェンス（```）や説明文は一切含めないでください。"
+                    "キーは queries のみ（文字列の配列）。"
+                ),
+            ),
+            (
+                "human",
+                (
+                    "編集指示を満たすために必要なWeb検索クエリを最大{max_queries}件挙げてください。"
+                    "検索が不要なら空配列を返してください。\n"
+                    "元の旅程: {itinerary}\n"
+                    "編集指示: {edit_prompt}\n"
+                    "出力: queries"
+                ),
+            ),
+        ]
+    )
+    plan_raw = await (plan_prompt | plan_llm | StrOutputParser()).ainvoke(
+        {"itinerary": itinerary, "edit_prompt": safe_prompt, "max_queries": max_queries}
+    )
     try:
-        obj = json.loads(final_text)
-        return {
-            "modifiedItinerary": obj.get("modifiedItinerary", itinerary),
-            "changeDescription": obj.get("changeDescription", "変更を適用しました"),
-        }
+        queries = [
+            q
+            for q in json.loads(strip_code_fences(plan_raw)).get("queries", [])
+            if isinstance(q, str) and q.strip()
+        ][:max_queries]
     except Exception as e:
-        logger.warning("rag_edit_itinerary JSON parse failed: %s | raw=%r", e, final_text)
-        return {
-            "modifiedItinerary": itinerary,
-            "changeDescription": "変更を適用しました",
-        }
-
+        # 検索なしの「RAG」編集を黙って返さず、呼び出し元のRAG失敗時フォールバックに任せる
+        raise ValueError(f"rag_plan_edit_itinerary plan parse failed: {e} | raw={plan_raw!r}") from e
+    planned = time.perf_counter()
+    logger.info("RAG plan: %d queries in %.2fs %r", len(queries), planned - started, queries)
+
+    # 2. 並列検索
+    results = await asyncio.gather(
+        *(tavily_search(q, deadline) for q in queries), return_exceptions=True
+    )
+    search_context = []
+    for q, r in zip(queries, results):
+        if isinstance(r, Exception):
+            logger.warning("RAG search failed query=%r: %s", q, r)
+            continue
+        search_context.append({"query": q, "results": r})
+    searched = time.perf_counter()
+    logger.info("RAG search: %d/%d succeeded in %.2fs", len(search_context), len(queries), searched - planned)
+
+    # 3. 一括生成
+    async def generate(output_mode: str) -> str:
+        """検索結果を踏まえて最終出力を生成する。"""
+        llm = create_deadline_llm(deadline)
+        output_instructions, output_keys = EDIT_OUTPUT_FORMATS[output_mode]
+        question = (
+            '検索結果を参考にして、旅程を改善してください。\n'
+            f'{output_instructions}'
+            f'検索結果: {search_context}\n'
+            f'元の旅程: {itinerary}\n'
+            f'編集指示: {safe_prompt}\n'
+            f'出力: {output_keys}'
+        )
+        generate_started = time.perf_counter()
+        final_text = (await llm.ainvoke(question)).content
+        logger.info(
+            "RAG generate (%s): %.2fs (total %.2fs), response length %d",
+            output_mode, time.perf_counter() - generate_started,
+            time.perf_counter() - started, len(final_text),
+        )
+        return final_text
 
+    final_text = await generate(mode)
+    try:
+        return build_edit_result(final_text, itinerary, mode, "rag_plan_edit_itinerary")
+    except PatchApplyError as e:
+        if mode != "patch":
+            raise
+        # 取得済みの検索結果を再利用し、最終生成だけをfullモードでやり直す
+        logger.warning("RAG(plan_parallel) patch could not be applied: %s", e)
+        record_patch_fallback("rag_plan_parallel")
+        final_text = await generate("full")
+        return build_edit_result(final_text, itinerary, "full", "rag_plan_edit_itinerary")
@@ -0,0 +1,103 @@
+"""差分編集（EDIT_MODE=patch）の操作を旅程に適用する。"""
+
+import json
+from typing import List
+
+from app.models.ai import (
+    AddDayOp,
+    AddEventOp,
+    ItineraryEditOp,
+    ItineraryEditPatch,
+    Itinerary,
+    RemoveDayOp,
+    RemoveEventOp,
+    ReplaceEventOp,
+    UpdateItineraryOp,
+)
+
+
+class PatchApplyError(ValueError):
+    """操作の解析・検証・適用に失敗したことを表す例外。"""
+
+
+def parse_edit_patch(raw: str) -> ItineraryEditPatch:
+    """LLM出力（JSON文字列）を操作一覧として検証する。
+
+    Args:
+        raw: LLMの出力
+
+    Returns:
+        ItineraryEditPatch: 検証済みの操作一覧
+
+    Raises:
+        PatchApplyError: JSONとして解釈できない、またはスキーマに合わない場合
+    """
+    try:
+        return ItineraryEditPatch.model_validate(json.loads(raw))
+    except Exception as e:
+        raise PatchApplyError(f"invalid patch output: {e}") from e
+
+
+def _check_index(name: str, index: int, size: int) -> None:
+    """インデックスが範囲内か検証する。"""
+    if not 0 <= index < size:
+        raise PatchApplyError(f"{name} index {index} out of range (size={size})")
+
+
+def apply_itinerary_ops(itinerary: Itinerary, operations: List[ItineraryEditOp]) -> Itinerary:
+    """操作を先頭から順に適用した新しい旅程を返す。
+
+    元の旅程は変更しない。1件でも適用できない操作があれば全体を失敗とする。
+
+    Args:
+        itinerary: 元の旅程
+        operations: 適用する操作の一覧
+
+    Returns:
+        Itinerary: 適用後の旅程
+
+    Raises:
+        PatchApplyError: 範囲外のインデックスなど、適用できない操作が含まれる場合
+
+    Example:
+        >>> op = RemoveEventOp(op="remove_event", day=0, index=0)
+        >>> apply_itinerary_ops(itinerary, [op])
+    """
+    result = itinerary.model_copy(deep=True)
+    for i, op in enumerate(operations):
+        try:
+            if isinstance(op, AddEventOp):
+                _check_index("day", op.day, len(result.days))
+                events = result.days[op.day].events
+                index = len(events) if op.index is None else op.index
+                if index > len(events):
+                    raise PatchApplyError(f"event index {index} out of range (size={len(events)})")
+                events.insert(index, op.event.model_copy())
+            elif isinstance(op, RemoveEventOp):
+                _check_index("day", op.day, len(result.days))
+                events = result.days[op.day].events
+                _check_index("event", op.index, len(events))
+                del events[op.index]
+            elif isinstance(op, ReplaceEventOp):
+                _check_index("day", op.day, len(result.days))
+                events = result.days[op.day].events
+                _check_index("event", op.index, len(events))
+                events[op.index] = op.event.model_copy()
+            elif isinstance(op, AddDayOp):
+                index = len(result.days) if op.index is None else op.index
+                if index > len(result.days):
+                    raise PatchApplyError(f"day index {index} out of range (size={len(result.days)})")
+                result.days.insert(index, op.day.model_copy(deep=True))
+            elif isinstance(op, RemoveDayOp):
+                _check_index("day", op.day, len(result.days))
+                del result.days[op.day]
+            elif isinstance(op, UpdateItineraryOp):
+                for field in ("title", "subtitle", "description"):
+                    value = getattr(op, field)
+                    if value is not None:
+                        setattr(result, field, value)
+            else:
+                raise PatchApplyError(f"unsupported operation: {op!r}")
+        except PatchApplyError as e:
+            raise PatchApplyError(f"operation #{i} ({op.op}): {e}") from e
+    return result
@@ -0,0 +1,123 @@
+"""RAG方式（react / plan_parallel）× 編集モード（full / patch）の所要時間と出力トークン数を比較するベンチマーク。
+
+実際のLLM・Tavily APIを呼び出すため、APIキーが設定された環境で実行する。
+本番と同じ経路で計測するため、RAG_MODE / EDIT_MODE を差し替えて edit_itinerary を呼び出す。
+Tavily APIの使用状況チェックやフォールバック（patch→full、ステップ上限超過時の通常チェーン）も
+本番同様に計測対象に含まれる。
+
+Usage:
+    python scripts/benchmark_rag_modes.py [--runs 3] [--prompt "2日目に美術館を追加して"]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from langchain_core.callbacks import get_usage_metadata_callback
+
+from app.core.config import settings
+from app.core.deadline import Deadline
+from app.core.edit_metrics import get_edit_metrics
+from app.services.ai_langchain import edit_itinerary
+
+SAMPLE_ITINERARY: Dict = {
+    "title": "京都2日間の旅",
+    "subtitle": "寺社と食べ歩き",
+    "description": "定番の寺社を巡りつつ、京都の食を楽しむ旅程",
+    "days": [
+        {
+            "date": "2025-04-01",
+            "events": [
+                {"time": "09:00", "end_time": "10:30", "title": "清水寺", "description": "清水の舞台を見学", "icon": "mdi-camera"},
+                {"time": "12:00", "end_time": "13:00", "title": "昼食", "description": "湯豆腐", "icon": "mdi-food"},
+            ],
+        },
+        {
+            "date": "2025-04-02",
+            "events": [
+                {"time": "10:00", "end_time": "11:30", "title": "伏見稲荷大社", "description": "千本鳥居を散策", "icon": "mdi-walk"},
+            ],
+        },
+    ],
+}
+
+DEFAULT_PROMPT = "2日目の午後に評判の良い美術館と、近くの人気カフェを追加してください。"
+
+RAG_MODES = ("react", "plan_parallel")
+EDIT_MODES = ("full", "patch")
+
+
+def _patch_fallbacks() -> int:
+    """これまでの patch→full フォールバック件数を返す。"""
+    return int(get_edit_metrics().get("patch", {}).get("patch_fallbacks", 0))
+
+
+async def run_mode(
+    rag_mode: str, edit_mode: str, prompt: str, runs: int
+) -> Tuple[List[float], List[int], int]:
+    """指定の組み合わせで edit_itinerary を複数回実行する。
+
+    Args:
+        rag_mode: RAG方式
+        edit_mode: 編集モード（full / patch）
+        prompt: 編集指示
+        runs: 実行回数
+
+    Returns:
+        各回の所要時間（秒）と出力トークン数、patch→full フォールバック回数
+    """
+    settings.rag_mode = rag_mode  # type: ignore[assignment]
+    settings.edit_mode = edit_mode  # type: ignore[assignment]
+    elapsed: List[float] = []
+    output_tokens: List[int] = []
+    fallbacks_before = _patch_fallbacks()
+    for _ in range(runs):
+        deadline = Deadline(settings.request_budget_sec)
+        started = time.perf_counter()
+        with get_usage_metadata_callback() as usage_cb:
+            await edit_itinerary(SAMPLE_ITINERARY, prompt, deadline)
+        elapsed.append(time.perf_counter() - started)
+        output_tokens.append(
+            sum(usage.get("output_tokens", 0) for usage in usage_cb.usage_metadata.values())
+        )
+    return elapsed, output_tokens, _patch_fallbacks() - fallbacks_before
+
+
+async def main() -> None:
+    """全組み合わせを実行して所要時間・出力トークン数の比較を表示する。"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT)
+    args = parser.parse_args()
+
+    if not settings.rag_enable:
+        sys.exit("TAVILY_API_KEY が未設定のためRAGが無効です（比較になりません）")
+
+    medians: Dict[Tuple[str, str], float] = {}
+    for rag_mode in RAG_MODES:
+        for edit_mode in EDIT_MODES:
+            elapsed, output_tokens, fallbacks = await run_mode(
+                rag_mode, edit_mode, args.prompt, args.runs
+            )
+            medians[(rag_mode, edit_mode)] = statistics.median(elapsed)
+            print(
+                f"{rag_mode:>14} / {edit_mode:<5}: median={medians[(rag_mode, edit_mode)]:.2f}s "
+                f"median_output_tokens={statistics.median(output_tokens):.0f} "
+                f"runs={[round(e, 2) for e in elapsed]} patch_fallbacks={fallbacks}"
+            )
+
+    for edit_mode in EDIT_MODES:
+        plan = medians[("plan_parallel", edit_mode)]
+        if plan > 0:
+            print(f"speedup react / plan_parallel ({edit_mode}): {medians[('react', edit_mode)] / plan:.2f}x")
+    for rag_mode in RAG_MODES:
+        patch = medians[(rag_mode, "patch")]
+        if patch > 0:
+            print(f"speedup full / patch ({rag_mode}): {medians[(rag_mode, 'full')] / patch:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,143 @@
+"""app.core.deadline のテスト。"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.core import deadline as deadline_module
+from app.core.config import settings
+from app.core.deadline import Deadline, get_cancellation_counts
+from app.main import app
+from app.routers import internal_ai
+
+ITINERARY = {
+    "title": "テスト旅行",
+    "days": [
+        {
+            "date": "2025-01-01",
+            "events": [
+                {"time": "09:00", "end_time": "10:00", "title": "散歩", "description": "朝の散歩", "icon": "mdi-walk"},
+            ],
+        }
+    ],
+}
+
+
+def _header_after(sec: float) -> str:
+    """現在からsec秒後のエポックミリ秒を返す。"""
+    return str(int((time.time() + sec) * 1000))
+
+
+@pytest.fixture
+def budget(monkeypatch: pytest.MonkeyPatch) -> None:
+    """予算関連の設定をテスト用の値に固定する。"""
+    monkeypatch.setattr(settings, "request_budget_sec", 30.0)
+    monkeypatch.setattr(settings, "deadline_safety_margin_sec", 1.0)
+    monkeypatch.setattr(settings, "agent_step_sec", 3.0)
+    monkeypatch.setattr(settings, "agent_max_recursion", 12)
+
+
+class TestFromHeader:
+    """Deadline.from_header のテスト"""
+
+    def test_missing_header_uses_budget(self, budget: None) -> None:
+        assert Deadline.from_header(None).remaining() == pytest.approx(30.0, abs=0.5)
+
+    def test_invalid_header_uses_budget(self, budget: None) -> None:
+        assert Deadline.from_header("not-a-number").remaining() == pytest.approx(30.0, abs=0.5)
+
+    def test_valid_header(self, budget: None) -> None:
+        assert Deadline.from_header(_header_after(10)).remaining() == pytest.approx(10.0, abs=0.5)
+
+    def test_past_header_is_expired(self, budget: None) -> None:
+        d = Deadline.from_header(_header_after(-5))
+        assert d.expired
+        assert d.remaining() == 0.0
+
+    def test_header_is_capped_at_budget(self, budget: None) -> None:
+        assert Deadline.from_header(_header_after(600)).remaining() == pytest.approx(30.0, abs=0.5)
+
+
+class TestBudgetDerivation:
+    """call_timeout / agent_recursion_limit のテスト"""
+
+    def test_call_timeout_is_capped(self, budget: None) -> None:
+        assert Deadline(20).call_timeout(5) == 5
+
+    def test_call_timeout_subtracts_margin(self, budget: None) -> None:
+        assert Deadline(4).call_timeout(60) == pytest.approx(3.0, abs=0.1)
+
+    def test_call_timeout_minimum(self, budget: None) -> None:
+        assert Deadline(0).call_timeout(60) == 0.1
+
+    def test_recursion_limit_floor(self, budget: None) -> None:
+        assert Deadline(1).agent_recursion_limit() == 3
+
+    def test_recursion_limit_from_remaining(self, budget: None) -> None:
+        assert Deadline(18.5).agent_recursion_limit() == 6
+
+    def test_recursion_limit_cap(self, budget: None) -> None:
+        assert Deadline(300).agent_recursion_limit() == 12
+
+
+async def _post_edit(headers: dict) -> httpx.Response:
+    """旅程編集エンドポイントを呼び出す。"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post(
+            "/internal/ai/itinerary-edit",
+            json={"originalItinerary": ITINERARY, "editPrompt": "散歩を削除して"},
+            headers=headers,
+        )
+
+
+class TestRunWithDeadline:
+    """エンドポイント経由の期限・キャンセル動作のテスト"""
+
+    async def test_completes_within_deadline(self, budget: None, monkeypatch: pytest.MonkeyPatch) -> None:
+        async def fast_edit(itinerary: dict, edit_prompt: str, deadline: Deadline) -> dict:
+            return {"modifiedItinerary": itinerary, "changeDescription": "変更なし"}
+
+        monkeypatch.setattr(internal_ai, "edit_itinerary", fast_edit)
+        res = await _post_edit({"X-Request-Deadline": _header_after(10)})
+
+        assert res.status_code == 200
+        assert res.json()["changeDescription"] == "変更なし"
+
+    async def test_deadline_exceeded_cancels_and_counts(
+        self, budget: None, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        cancelled = asyncio.Event()
+
+        async def slow_edit(itinerary: dict, edit_prompt: str, deadline: Deadline) -> dict:
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return {"modifiedItinerary": itinerary, "changeDescription": "遅延"}
+
+        monkeypatch.setattr(internal_ai, "edit_itinerary", slow_edit)
+        before = get_cancellation_counts()["deadline_exceeded"]
+
+        started = time.monotonic()
+        res = await _post_edit({"X-Request-Deadline": _header_after(1.5)})
+
+        assert res.status_code == 504
+        assert res.json()["detail"] == "deadline_exceeded"
+        # 安全マージン分だけ期限より前に打ち切る
+        assert time.monotonic() - started < 1.5
+        assert cancelled.is_set()
+        assert get_cancellation_counts()["deadline_exceeded"] == before + 1
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            health = (await client.get("/health")).json()
+        assert health["cancellations"]["deadline_exceeded"] == before + 1
+
+    async def test_record_cancellation(self) -> None:
+        before = get_cancellation_counts()["client_disconnected"]
+        deadline_module.record_cancellation("client_disconnected")
+        assert get_cancellation_counts()["client_disconnected"] == before + 1
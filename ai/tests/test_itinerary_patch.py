@@ -0,0 +1,237 @@
+"""app.services.itinerary_patch と差分編集モードのテスト。"""
+
+import json
+from typing import Any, List
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from app.core import edit_metrics
+from app.core.config import settings
+from app.core.deadline import Deadline
+from app.models.ai import Itinerary
+from app.services import ai_langchain
+from app.services.itinerary_patch import PatchApplyError, apply_itinerary_ops, parse_edit_patch
+
+
+def _event(title: str, time: str = "09:00") -> dict:
+    """テスト用イベントを生成する。"""
+    return {"time": time, "end_time": time, "title": title, "description": f"{title}の説明", "icon": "mdi-map-marker"}
+
+
+@pytest.fixture
+def itinerary() -> Itinerary:
+    """2日間・3イベントの旅程を返す。"""
+    return Itinerary.model_validate(
+        {
+            "title": "京都旅行",
+            "subtitle": "春",
+            "description": "寺社巡り",
+            "days": [
+                {"date": "2025-04-01", "events": [_event("清水寺"), _event("昼食", "12:00")]},
+                {"date": "2025-04-02", "events": [_event("伏見稲荷")]},
+            ],
+        }
+    )
+
+
+def _apply(itinerary: Itinerary, operations: List[dict]) -> Itinerary:
+    """操作一覧をJSON経由で検証して適用する。"""
+    patch = parse_edit_patch(json.dumps({"operations": operations, "changeDescription": "変更"}))
+    return apply_itinerary_ops(itinerary, patch.operations)
+
+
+def _titles(itinerary: Itinerary, day: int) -> List[str]:
+    """指定日のイベントタイトル一覧を返す。"""
+    return [e.title for e in itinerary.days[day].events]
+
+
+class TestApplyItineraryOps:
+    """apply_itinerary_ops のテスト"""
+
+    def test_add_event_at_index(self, itinerary: Itinerary) -> None:
+        result = _apply(itinerary, [{"op": "add_event", "day": 0, "index": 1, "event": _event("美術館")}])
+        assert _titles(result, 0) == ["清水寺", "美術館", "昼食"]
+
+    def test_add_event_appends_by_default(self, itinerary: Itinerary) -> None:
+        result = _apply(itinerary, [{"op": "add_event", "day": 1, "event": _event("美術館")}])
+        assert _titles(result, 1) == ["伏見稲荷", "美術館"]
+
+    def test_add_event_at_len(self, itinerary: Itinerary) -> None:
+        result = _apply(itinerary, [{"op": "add_event", "day": 0, "index": 2, "event": _event("美術館")}])
+        assert _titles(result, 0) == ["清水寺", "昼食", "美術館"]
+
+    def test_remove_event(self, itinerary: Itinerary) -> None:
+        result = _apply(itinerary, [{"op": "remove_event", "day": 0, "index": 0}])
+        assert _titles(result, 0) == ["昼食"]
+
+    def test_replace_event(self, itinerary: Itinerary) -> None:
+        result = _apply(itinerary, [{"op": "replace_event", "day": 1, "index": 0, "event": _event("金閣寺")}])
+        assert _titles(result, 1) == ["金閣寺"]
+
+    def test_add_day_at_len(self, itinerary: Itinerary) -> None:
+        result = _apply(
+            itinerary,
+            [{"op": "add_day", "index": 2, "day": {"date": "2025-04-03", "events": [_event("嵐山")]}}],
+        )
+        assert [d.date for d in result.days] == ["2025-04-01", "2025-04-02", "2025-04-03"]
+        assert _titles(result, 2) == ["嵐山"]
+
+    def test_add_day_at_head(self, itinerary: Itinerary) -> None:
+        result = _apply(itinerary, [{"op": "add_day", "index": 0, "day": {"date": "2025-03-31"}}])
+        assert [d.date for d in result.days] == ["2025-03-31", "2025-04-01", "2025-04-02"]
+
+    def test_remove_day(self, itinerary: Itinerary) -> None:
+        result = _apply(itinerary, [{"op": "remove_day", "day": 0}])
+        assert [d.date for d in result.days] == ["2025-04-02"]
+
+    def test_update_itinerary_partial(self, itinerary: Itinerary) -> None:
+        result = _apply(itinerary, [{"op": "update_itinerary", "title": "京都・奈良旅行"}])
+        assert result.title == "京都・奈良旅行"
+        assert result.subtitle == "春"
+        assert result.description == "寺社巡り"
+
+    def test_sequential_index_shift(self, itinerary: Itinerary) -> None:
+        # 2件目の操作の位置は1件目を適用した後の旅程に対するもの
+        result = _apply(
+            itinerary,
+            [
+                {"op": "add_event", "day": 0, "index": 0, "event": _event("朝食", "08:00")},
+                {"op": "remove_event", "day": 0, "index": 1},
+                {"op": "remove_day", "day": 0},
+                {"op": "replace_event", "day": 0, "index": 0, "event": _event("金閣寺")},
+            ],
+        )
+        assert len(result.days) == 1
+        assert _titles(result, 0) == ["金閣寺"]
+
+    def test_out_of_range_day(self, itinerary: Itinerary) -> None:
+        with pytest.raises(PatchApplyError, match="day index 2"):
+            _apply(itinerary, [{"op": "add_event", "day": 2, "event": _event("美術館")}])
+
+    def test_out_of_range_event(self, itinerary: Itinerary) -> None:
+        with pytest.raises(PatchApplyError, match="event index 1"):
+            _apply(itinerary, [{"op": "remove_event", "day": 1, "index": 1}])
+
+    def test_add_beyond_len(self, itinerary: Itinerary) -> None:
+        with pytest.raises(PatchApplyError):
+            _apply(itinerary, [{"op": "add_event", "day": 1, "index": 2, "event": _event("美術館")}])
+        with pytest.raises(PatchApplyError):
+            _apply(itinerary, [{"op": "add_day", "index": 3, "day": {"date": "2025-04-05"}}])
+
+    def test_shift_makes_later_op_out_of_range(self, itinerary: Itinerary) -> None:
+        with pytest.raises(PatchApplyError, match="operation #1"):
+            _apply(
+                itinerary,
+                [{"op": "remove_day", "day": 1}, {"op": "remove_event", "day": 1, "index": 0}],
+            )
+
+    def test_original_is_unchanged(self, itinerary: Itinerary) -> None:
+        before = itinerary.model_dump()
+        _apply(
+            itinerary,
+            [
+                {"op": "add_event", "day": 0, "event": _event("美術館")},
+                {"op": "replace_event", "day": 1, "index": 0, "event": _event("金閣寺")},
+                {"op": "update_itinerary", "title": "変更後"},
+                {"op": "remove_day", "day": 0},
+            ],
+        )
+        assert itinerary.model_dump() == before
+
+
+class TestParseEditPatch:
+    """parse_edit_patch のテスト"""
+
+    @pytest.mark.parametrize(
+        "raw",
+        [
+            "not json",
+            '{"operations": [{"op": "rename_day", "day": 0}], "changeDescription": "x"}',
+            '{"operations": [{"op": "remove_event", "day": -1, "index": 0}], "changeDescription": "x"}',
+            '{"operations": []}',
+            '```json\n{"operations": [], "changeDescription": "x"}\n```',
+        ],
+    )
+    def test_invalid_output(self, raw: str) -> None:
+        with pytest.raises(PatchApplyError):
+            parse_edit_patch(raw)
+
+
+class TestEditItineraryPatchMode:
+    """edit_itinerary の patch→full フォールバックのテスト"""
+
+    async def test_falls_back_to_full_regeneration(
+        self, itinerary: Itinerary, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        original = itinerary.model_dump()
+        full = dict(original, title="全体再生成")
+        responses = [
+            json.dumps({"operations": [{"op": "remove_day", "day": 5}], "changeDescription": "patch"}),
+            json.dumps({"modifiedItinerary": full, "changeDescription": "full"}),
+        ]
+        llm = FakeListChatModel(responses=responses)
+
+        def fake_create_llm(*args: Any, **kwargs: Any) -> FakeListChatModel:
+            return llm
+
+        paths: List[str] = []
+        record = edit_metrics.record_patch_fallback
+        monkeypatch.setattr(ai_langchain, "create_llm", fake_create_llm)
+        monkeypatch.setattr(ai_langchain, "record_patch_fallback", lambda path: (paths.append(path), record(path)))
+        monkeypatch.setattr(settings, "tavily_api_key", None)
+        monkeypatch.setattr(settings, "edit_mode", "patch")
+        before = edit_metrics.get_edit_metrics().get("patch_fallback", {}).get("count", 0)
+
+        result = await ai_langchain.edit_itinerary(original, "存在しない日を削除して", Deadline(30))
+
+        assert result == {"modifiedItinerary": full, "changeDescription": "full"}
+        assert paths == ["simple"]
+        assert edit_metrics.get_edit_metrics()["patch_fallback"]["count"] == before + 1
+
+    async def test_applies_patch(self, itinerary: Itinerary, monkeypatch: pytest.MonkeyPatch) -> None:
+        llm = FakeListChatModel(
+            responses=[
+                json.dumps(
+                    {
+                        "operations": [{"op": "add_event", "day": 1, "event": _event("美術館", "14:00")}],
+                        "changeDescription": "美術館を追加しました",
+                    }
+                )
+            ]
+        )
+        monkeypatch.setattr(ai_langchain, "create_llm", lambda *args, **kwargs: llm)
+        monkeypatch.setattr(settings, "tavily_api_key", None)
+        monkeypatch.setattr(settings, "edit_mode", "patch")
+
+        result = await ai_langchain.edit_itinerary(itinerary.model_dump(), "2日目に美術館を追加して", Deadline(30))
+
+        assert result["changeDescription"] == "美術館を追加しました"
+        assert [e["title"] for e in result["modifiedItinerary"]["days"][1]["events"]] == ["伏見稲荷", "美術館"]
+
+    async def test_plan_parallel_reuses_search_results(
+        self, itinerary: Itinerary, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        original = itinerary.model_dump()
+        full = dict(original, title="検索に基づく再生成")
+        llm = FakeListChatModel(
+            responses=[
+                '```json\n{"queries": ["京都 美術館"]}\n```',
+                json.dumps({"operations": [{"op": "remove_day", "day": 9}], "changeDescription": "patch"}),
+                json.dumps({"modifiedItinerary": full, "changeDescription": "full"}),
+            ]
+        )
+        searches: List[str] = []
+
+        async def fake_search(query: str, deadline: Any = None, **kwargs: Any) -> list:
+            searches.append(query)
+            return [{"url": "https://example.com", "content": "美術館"}]
+
+        monkeypatch.setattr(ai_langchain, "create_llm", lambda *args, **kwargs: llm)
+        monkeypatch.setattr(ai_langchain, "tavily_search", fake_search)
+
+        result = await ai_langchain.rag_plan_edit_itinerary(original, "美術館を追加して", Deadline(30), "patch")
+
+        assert result == {"modifiedItinerary": full, "changeDescription": "full"}
+        # 検索は1回のみ（再生成時に再検索しない）
+        assert searches == ["京都 美術館"]
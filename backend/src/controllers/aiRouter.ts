@@ -91,6 +91,7 @@ async function generateDiffPatch(
  * @errors 401 unauthorized - 認証失敗
  * @errors 422 AI generation failed - LLM生成エラー
  * @errors 502 service_unavailable - 内部AIサービス利用不可
+ * @errors 504 ai_timeout - 内部AIサービスが期限内に応答しなかった
  * @errors 500 internal_server_error - 予期しないサーバーエラー
  */
 export const postEventsComplete: RequestHandler = async (req, res) => {
@@ -112,6 +113,8 @@ export const postEventsComplete: RequestHandler = async (req, res) => {
       });
     if (status === 422)
       return res.status(422).json({ error: 'AI generation failed' });
+    if (status === 504 || e?.code === 'ECONNABORTED')
+      return res.status(504).json({ error: 'ai_timeout' });
     return res.status(500).json({ error: 'internal_server_error' });
   }
 };
@@ -126,6 +129,7 @@ export const postEventsComplete: RequestHandler = async (req, res) => {
  * @errors 401 unauthorized - 認証失敗
  * @errors 422 AI generation failed - LLM生成エラー
  * @errors 502 service_unavailable - 内部AIサービス利用不可
+ * @errors 504 ai_timeout - 内部AIサービスが期限内に応答しなかった
  * @errors 500 internal_server_error - 予期しないサーバーエラー
  */
 export const postItineraryEdit: RequestHandler = async (req, res) => {
@@ -176,6 +180,8 @@ export const postItineraryEdit: RequestHandler = async (req, res) => {
       return res
         .status(422)
         .json({ success: false, error: 'AI generation failed' });
+    if (status === 504 || e?.code === 'ECONNABORTED')
+      return res.status(504).json({ success: false, error: 'ai_timeout' });
     return res
       .status(500)
       .json({ success: false, error: 'internal_server_error' });
@@ -1,10 +1,14 @@
 import axios, { AxiosInstance } from 'axios';
 
+/** FastAPI呼び出しの全体タイムアウト（ミリ秒） */
+const AI_REQUEST_TIMEOUT_MS = 30000;
+
 /**
  * 内部FastAPI呼び出しクライアント。
  *
  * @summary FastAPIの/internal/aiエンドポイントを内部HTTPで呼び出す
- * @remarks X-Internal-Tokenヘッダを自動付与し、外部からの直接アクセスを防止
+ * @remarks X-Internal-Tokenヘッダを自動付与し、外部からの直接アクセスを防止。
+ * X-Request-Deadline（エポックミリ秒）を付与し、Python側で期限超過した処理を打ち切らせる。
  */
 class InternalPythonClient {
   private http: AxiosInstance;
@@ -14,12 +18,21 @@ class InternalPythonClient {
   constructor() {
     this.aiBaseUrl = process.env.INTERNAL_AI_BASE_URL || 'http://ai:3000';
     this.internalToken = process.env.INTERNAL_AI_TOKEN || '';
-    this.http = axios.create({ baseURL: this.aiBaseUrl, timeout: 30000 });
+    this.http = axios.create({
+      baseURL: this.aiBaseUrl,
+      timeout: AI_REQUEST_TIMEOUT_MS,
+    });
 
     // 送信前にヘッダを付与
     this.http.interceptors.request.use(async (config) => {
       config.headers = config.headers || {};
 
+      // Python側はこの期限から LLM/検索のタイムアウトとエージェントのステップ上限を導出する
+      const timeoutMs = config.timeout || AI_REQUEST_TIMEOUT_MS;
+      (config.headers as Record<string, string>)['X-Request-Deadline'] = String(
+        Date.now() + timeoutMs
+      );
+
       // NOTE: X-Internal-Token はローカル/将来の再導入に備えて保持。
       // 本番の一次認証は Cloud Run の ID トークン + roles/run.invoker。
       // 既存のアプリ層ガード（ローカル/Compose向け）